@@ -26,16 +26,54 @@ Environment:
 
 import argparse
 import base64
+import functools
+import http.client
+import io
 import json
+import mmap
 import os
 import struct
 import sys
-import urllib.error
-import urllib.request
+import urllib.parse
 import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # Optional accelerator. Everything below works without it; when numpy is
+    # present the PNG filter reconstruction runs vectorized instead of
+    # byte-at-a-time in the interpreter.
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    # Optional accelerator. When Pillow is present, spritesheet assembly
+    # uses its C PNG codecs instead of the hand-rolled stdlib decoder.
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    # Optional accelerator. orjson serializes request bodies straight to
+    # UTF-8 bytes, several times faster than the stdlib json encoder.
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional accelerator. Numba compiles the serial Paeth loop to native
+    # code; the first call pays the JIT cost, cached on disk afterwards.
+    from numba import njit
+except ImportError:
+    njit = None
 
 API_BASE = "https://api.pixellab.ai/v2"
 
+# Precompiled struct formats: skips format-string parsing and the
+# intermediate slice on every PNG chunk header.
+_U32 = struct.Struct(">I")
+_IHDR = struct.Struct(">IIBBBBB")
+
 
 def get_api_key():
     key = os.environ.get("PIXELLAB_API_KEY")
@@ -44,28 +82,55 @@ def get_api_key():
     return key, None
 
 
+@functools.lru_cache(maxsize=64)
 def encode_image(path):
-    """Read a PNG file and return base64-encoded string."""
+    """Return a PNG file's base64 encoding as ASCII bytes.
+
+    Encodes straight from an mmap of the file, so the raw contents never
+    land on the heap - only the encoded payload is materialized (and
+    cached, for commands that embed the same image more than once).
+    Kept as bytes so encode_json_body can splice the payload into the
+    request body without a str round-trip.
+    """
     with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode("ascii")
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return base64.b64encode(mm)
+        except ValueError:  # zero-length files cannot be mapped
+            return base64.b64encode(f.read())
+
+
+def write_file_bytes(path, data):
+    """Write a whole buffer to path in one unbuffered syscall.
+
+    Skips Python's buffered IO stack, which would chunk a multi-hundred-KB
+    PNG into 8KB writes.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
 
 
 def decode_image(b64_data, output_path):
     """Decode base64 image data and save as PNG."""
-    data = base64.b64decode(b64_data)
-    with open(output_path, "wb") as f:
-        f.write(data)
+    write_file_bytes(output_path, base64.b64decode(b64_data))
+
+
+def _png_dimensions(header):
+    """Parse width and height out of an in-memory PNG header."""
+    if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
+        w = _U32.unpack_from(header, 16)[0]
+        h = _U32.unpack_from(header, 20)[0]
+        return w, h
+    return None, None
 
 
 def get_png_dimensions(path):
     """Read width and height from a PNG file header."""
     with open(path, "rb") as f:
-        header = f.read(24)
-        if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
-            w = struct.unpack(">I", header[16:20])[0]
-            h = struct.unpack(">I", header[20:24])[0]
-            return w, h
-    return None, None
+        return _png_dimensions(f.read(24))
 
 
 def make_base64_image(path):
@@ -74,44 +139,164 @@ def make_base64_image(path):
 
 
 def make_style_image(path):
-    """Create a style image object with image data and dimensions."""
-    w, h = get_png_dimensions(path)
-    obj = {"image": make_base64_image(path)}
+    """Create a style image object with image data and dimensions.
+
+    The file is read once; the dimensions are parsed off the same buffer
+    that gets base64-encoded rather than through a second open().
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    w, h = _png_dimensions(data)
+    obj = {"image": {"type": "base64", "base64": base64.b64encode(data)}}
     if w and h:
         obj["width"] = w
         obj["height"] = h
     return obj
 
 
+def encode_json_body(body):
+    """Serialize a request body to a list of UTF-8 JSON byte chunks.
+
+    base64 image payloads travel through the body as ASCII bytes; they are
+    swapped for sentinel strings during json.dumps and spliced back in
+    afterwards, so each payload is written into the output once instead of
+    being decoded to str, copied into the JSON text, and re-encoded. The
+    chunks are returned unjoined - http.client sends an iterable body
+    piece by piece, so the full multi-megabyte request is never held as
+    one contiguous buffer. For a body with several embedded images this
+    cuts peak memory roughly 3x.
+    """
+    blobs = []
+    marker = f"@blob:{os.urandom(8).hex()}:"
+
+    def strip_blobs(obj):
+        if isinstance(obj, dict):
+            return {k: strip_blobs(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [strip_blobs(v) for v in obj]
+        if isinstance(obj, (bytes, bytearray)):
+            blobs.append(obj)
+            return f"{marker}{len(blobs) - 1}@"
+        return obj
+
+    if orjson is not None:
+        text = orjson.dumps(strip_blobs(body))
+    else:
+        # ensure_ascii is the json default, so the scaffolding is plain
+        # ASCII.
+        text = json.dumps(strip_blobs(body), separators=(",", ":")).encode("ascii")
+    if not blobs:
+        return [text]
+
+    parts = text.split(marker.encode("ascii"))
+    out = [parts[0]]
+    for part in parts[1:]:
+        index, rest = part.split(b"@", 1)
+        out.append(blobs[int(index)])
+        out.append(rest)
+    return out
+
+
+_API_URL = urllib.parse.urlsplit(API_BASE)
+_conn = None
+
+
+def _get_conn():
+    """Return the shared keep-alive HTTPS connection, creating it lazily."""
+    global _conn
+    if _conn is None:
+        _conn = http.client.HTTPSConnection(_API_URL.netloc, timeout=600)
+    return _conn
+
+
+def _close_conn():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+
+
+def make_base64_images(paths, make=None):
+    """Encode several image files concurrently.
+
+    File reads and the C base64 pass both release the GIL, so a 16-frame
+    animation encodes in roughly one frame's latency. make overrides the
+    per-path constructor (e.g. make_style_image).
+    """
+    make = make or make_base64_image
+    if len(paths) <= 1:
+        return [make(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=min(8, len(paths))) as ex:
+        return list(ex.map(make, paths))
+
+
 def api_request(method, endpoint, body=None, api_key=None):
-    """Make an API request and return parsed JSON response."""
-    url = f"{API_BASE}{endpoint}"
+    """Make an API request and return parsed JSON response.
+
+    One TLS connection is kept open at module scope and reused across
+    calls, so batched invocations in the same process pay the handshake
+    once instead of per request.
+    """
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
+        "Connection": "keep-alive",
     }
 
     if body is not None:
-        data = json.dumps(body).encode("utf-8")
+        data = encode_json_body(body)
+        # Explicit length: http.client would otherwise fall back to
+        # chunked transfer for an iterable body. The list re-iterates
+        # cleanly if the keep-alive retry below resends it.
+        headers["Content-Length"] = str(sum(len(p) for p in data))
     else:
         data = None
 
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    while True:
+        reused = _conn is not None
+        conn = _get_conn()
+        try:
+            conn.request(method, _API_URL.path + endpoint, body=data, headers=headers)
+            resp = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            # ConnectionResetError / RemoteDisconnected and friends;
+            # anything else is a bug and should surface as a traceback.
+            _close_conn()
+            if reused and not isinstance(e, TimeoutError):
+                # The server likely dropped the idle keep-alive socket
+                # before we sent anything; retry once on a fresh
+                # connection. Failures on a fresh connection are real,
+                # and a timeout means the request was delivered and is
+                # still being processed - neither is ever retried
+                # (requests cost money).
+                continue
+            return None, f"Connection error: {e}"
+        break
 
     try:
-        with urllib.request.urlopen(req, timeout=600) as resp:
-            return json.loads(resp.read().decode("utf-8")), None
-    except urllib.error.HTTPError as e:
-        try:
-            error_body = json.loads(e.read().decode("utf-8"))
-            detail = error_body.get("detail", str(error_body))
-        except Exception:
-            detail = e.reason
-        return None, f"HTTP {e.code}: {detail}"
-    except urllib.error.URLError as e:
-        return None, f"Connection error: {e.reason}"
-    except Exception as e:
-        return None, str(e)
+        raw = resp.read()
+    except (OSError, http.client.HTTPException) as e:
+        # A response arrived, so the server has already accepted (and
+        # for POSTs, charged) the request; resending now could submit
+        # the generation twice. A failure while reading the body is
+        # therefore always an error, never a retry.
+        _close_conn()
+        return None, f"Connection error: {e}"
+
+    try:
+        parsed = json.loads(raw.decode("utf-8"))
+    except Exception:
+        parsed = None
+
+    if resp.status >= 400:
+        if isinstance(parsed, dict):
+            detail = parsed.get("detail", str(parsed))
+        else:
+            detail = resp.reason
+        return None, f"HTTP {resp.status}: {detail}"
+    if parsed is None:
+        return None, "Invalid JSON in API response"
+    return parsed, None
 
 
 def output_success(output_files, cost_usd, extra=None):
@@ -154,140 +339,485 @@ def save_image_array(images, base_path, pick=None):
         path = f"{base_path}.png"
         decode_image(images[0]["base64"], path)
         output_files.append(path)
+    elif images:
+        # Per-frame base64 decode + file write are independent and
+        # IO-bound; overlap them across a small thread pool. The paths
+        # list is built up front, so ordering never depends on which
+        # worker finishes first. An empty array skips the pool, which
+        # rejects max_workers=0.
+        output_files = [f"{base_path}_{i}.png" for i in range(len(images))]
+        with ThreadPoolExecutor(max_workers=min(8, len(images))) as ex:
+            list(ex.map(decode_image,
+                        (img["base64"] for img in images),
+                        output_files))
+    return output_files
+
+
+def save_animation_frames(images, base, args):
+    """Save animation frames plus an optional horizontal spritesheet.
+
+    The base64 payloads are decoded exactly once: the same PNG bytes are
+    written to the per-frame files and handed to make_spritesheet, so
+    frames are never read back from disk or re-decoded for the sheet.
+    """
+    if base.endswith(".png"):
+        base = base[:-4]
+    frames_data = [base64.b64decode(img["base64"]) for img in images]
+
+    if len(frames_data) == 1:
+        output_files = [f"{base}.png"]
+        write_file_bytes(output_files[0], frames_data[0])
+    elif frames_data:
+        output_files = [f"{base}_{i}.png" for i in range(len(frames_data))]
+        with ThreadPoolExecutor(max_workers=min(8, len(frames_data))) as ex:
+            list(ex.map(write_file_bytes, output_files, frames_data))
     else:
-        for i, img in enumerate(images):
-            path = f"{base_path}_{i}.png"
-            decode_image(img["base64"], path)
-            output_files.append(path)
+        # An empty frame array skips the pool, which rejects
+        # max_workers=0.
+        output_files = []
+
+    if (args.spritesheet or args.spritesheet_store) and len(output_files) > 1:
+        sheet_path = f"{base}_spritesheet.png"
+        make_spritesheet(output_files, sheet_path, frames_data=frames_data,
+                         level=0 if args.spritesheet_store else args.compression_level)
+        output_files.append(sheet_path)
     return output_files
 
 
-def make_spritesheet(frame_paths, output_path):
-    """Combine frame PNGs into a horizontal spritesheet."""
-    frames = []
-    for path in frame_paths:
-        with open(path, "rb") as f:
-            png_data = f.read()
-        w, h, pixels = decode_png_pixels(png_data)
-        frames.append((w, h, pixels))
+def make_spritesheet(frame_paths, output_path, frames_data=None, level=1):
+    """Combine frame PNGs into a horizontal spritesheet.
 
-    if not frames:
+    frames_data optionally supplies each frame's PNG bytes (e.g. straight
+    from the API response), skipping the disk re-read of files that were
+    just written. level=0 emits stored (uncompressed) DEFLATE blocks for
+    a near-memcpy encode.
+    """
+    if frames_data is None:
+        if not frame_paths:
+            return
+        frames_data = []
+        for path in frame_paths:
+            with open(path, "rb") as f:
+                frames_data.append(f.read())
+    elif not frames_data:
         return
 
-    frame_w, frame_h = frames[0][0], frames[0][1]
-    total_w = frame_w * len(frames)
+    if Image is not None:
+        imgs = [Image.open(io.BytesIO(d)).convert("RGBA") for d in frames_data]
+        sheet = Image.new("RGBA", (sum(i.width for i in imgs), imgs[0].height))
+        x = 0
+        for img in imgs:
+            sheet.paste(img, (x, 0))
+            x += img.width
+        sheet.save(output_path, compress_level=level)
+        return
 
-    rows = []
-    for y in range(frame_h):
-        row = b"\x00"  # filter byte: None
+    # Frame decodes are independent, and the zlib half of each releases
+    # the GIL, so it overlaps with another frame's Python-level
+    # unfiltering.
+    if len(frames_data) > 1:
+        with ThreadPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, len(frames_data))) as ex:
+            frames = list(ex.map(decode_png_pixels, frames_data))
+    else:
+        frames = [decode_png_pixels(d) for d in frames_data]
+
+    frame_h = frames[0][1]
+    total_w = sum(f[0] for f in frames)
+
+    if np is not None:
+        # Column 0 of every scanline is the (zero) filter byte; each frame
+        # lands in the sheet with a single 2D slice assignment. The frames
+        # cover every other byte, so only the filter column needs zeroing.
+        sheet = np.empty((frame_h, 1 + total_w * 4), np.uint8)
+        sheet[:, 0] = 0
+        x = 0
         for fw, fh, pixels in frames:
-            row_start = y * (fw * 4)
-            row_end = row_start + fw * 4
-            row += pixels[row_start:row_end]
-        rows.append(row)
+            sheet[:, 1 + x * 4:1 + (x + fw) * 4] = np.frombuffer(
+                pixels, np.uint8).reshape(fh, fw * 4)[:frame_h]
+            x += fw
+        write_png(output_path, total_w, frame_h, sheet.tobytes(), level=level)
+        return
 
-    raw_data = b"".join(rows)
-    write_png(output_path, total_w, frame_h, raw_data)
+    # One preallocated scanline buffer; the leading filter byte of every
+    # row stays 0 (None), frames are blitted in with slice assignment.
+    out_stride = total_w * 4 + 1
+    raw_data = bytearray(frame_h * out_stride)
+    x = 0
+    for fw, fh, pixels in frames:
+        fstride = fw * 4
+        for y in range(frame_h):
+            dst = y * out_stride + 1 + x * 4
+            raw_data[dst:dst + fstride] = pixels[y * fstride:y * fstride + fstride]
+        x += fw
 
+    write_png(output_path, total_w, frame_h, bytes(raw_data), level=level)
 
+
+@functools.lru_cache(maxsize=32)
 def decode_png_pixels(data):
-    """Minimal PNG decoder - returns (width, height, raw_rgba_bytes)."""
+    """Minimal PNG decoder - returns (width, height, raw_rgba_bytes).
+
+    Results are memoized on the PNG bytes, so a frame that appears more
+    than once (repeated frames in a sheet, or a sheet rebuilt in the same
+    process) is only unfiltered once.
+    """
     if data[:8] != b"\x89PNG\r\n\x1a\n":
         raise ValueError("Not a PNG file")
 
     pos = 8
     width = height = bit_depth = color_type = 0
-    idat_chunks = []
+    decomp = zlib.decompressobj()
+    raw = bytearray()
 
     while pos < len(data):
-        chunk_len = struct.unpack(">I", data[pos:pos + 4])[0]
+        chunk_len = _U32.unpack_from(data, pos)[0]
         chunk_type = data[pos + 4:pos + 8]
         chunk_data = data[pos + 8:pos + 8 + chunk_len]
         pos += 12 + chunk_len
 
         if chunk_type == b"IHDR":
-            width = struct.unpack(">I", chunk_data[0:4])[0]
-            height = struct.unpack(">I", chunk_data[4:8])[0]
-            bit_depth = chunk_data[8]
-            color_type = chunk_data[9]
+            width, height, bit_depth, color_type = _IHDR.unpack_from(chunk_data)[:4]
         elif chunk_type == b"IDAT":
-            idat_chunks.append(chunk_data)
+            # Stream each IDAT straight through the decompressor so the
+            # compressed stream is never buffered as one big blob.
+            raw += decomp.decompress(chunk_data)
         elif chunk_type == b"IEND":
             break
 
+    raw += decomp.flush()
+
     if color_type not in (2, 6):
         raise ValueError(f"Unsupported color type {color_type} (need RGB or RGBA)")
 
-    raw = zlib.decompress(b"".join(idat_chunks))
     channels = 4 if color_type == 6 else 3
     stride = width * channels
 
-    pixels = bytearray()
+    out_stride = width * 4
     prev_row = bytearray(stride)
 
-    for y in range(height):
+    if color_type == 2 and np is not None:
+        # RGB rows are collected as-is and widened to RGBA at the end in
+        # two whole-image C-level copies (see finish_pixels).
+        rgb_plane = np.empty((height, stride), np.uint8)
+        pixels = None
+    else:
+        pixels = bytearray(height * out_stride)
+
+    if color_type == 2 and np is None:
+        # Reusable scratch row with the alpha column preset to 0xFF; the
+        # striped slice assignments below run in C at memcpy speed.
+        rgba_row = bytearray(b"\x00\x00\x00\xff" * width)
+
+    def store_row(y, row_data):
+        if pixels is None:
+            rgb_plane[y] = np.frombuffer(row_data, np.uint8)
+        elif color_type == 2:  # RGB -> RGBA
+            rgba_row[0::4] = row_data[0::3]
+            rgba_row[1::4] = row_data[1::3]
+            rgba_row[2::4] = row_data[2::3]
+            pixels[y * out_stride:(y + 1) * out_stride] = rgba_row
+        else:
+            pixels[y * out_stride:(y + 1) * out_stride] = row_data
+
+    def finish_pixels():
+        if pixels is not None:
+            return bytes(pixels)
+        rgba = np.empty((height, width, 4), np.uint8)
+        rgba[..., :3] = rgb_plane.reshape(height, width, 3)
+        rgba[..., 3] = 255
+        return rgba.tobytes()
+
+    # API-returned pixel art frequently ships with no filtering at all; when
+    # every filter byte is 0 reconstruction is a no-op, so just strip the
+    # filter column.
+    if not any(raw[:height * (stride + 1):stride + 1]):
+        if np is not None and color_type == 6:
+            # One strided copy drops the filter column and lands the
+            # result directly, with no intermediate output buffer.
+            arr = np.frombuffer(raw, np.uint8, height * (stride + 1)).reshape(
+                height, stride + 1)
+            return width, height, arr[:, 1:].tobytes()
+        view = memoryview(raw)
+        for y in range(height):
+            start = y * (stride + 1) + 1
+            row = view[start:start + stride]
+            store_row(y, row if color_type == 6 else bytes(row))
+        return width, height, finish_pixels()
+
+    # With numpy, RGBA scanlines are unfiltered in place on views of the
+    # decompressed buffer, skipping one bytearray copy per row.
+    use_views = np is not None and color_type == 6
+    if use_views:
+        arr2d = np.frombuffer(raw, np.uint8, height * (stride + 1)).reshape(
+            height, stride + 1)
+        prev_row = np.zeros(stride, np.uint8)
+
+    y = 0
+    while y < height:
         row_start = y * (stride + 1)
         filter_byte = raw[row_start]
-        row_data = bytearray(raw[row_start + 1:row_start + 1 + stride])
-
-        if filter_byte == 1:  # Sub
-            for i in range(channels, stride):
-                row_data[i] = (row_data[i] + row_data[i - channels]) & 0xFF
-        elif filter_byte == 2:  # Up
-            for i in range(stride):
-                row_data[i] = (row_data[i] + prev_row[i]) & 0xFF
-        elif filter_byte == 3:  # Average
-            for i in range(stride):
-                a = row_data[i - channels] if i >= channels else 0
-                row_data[i] = (row_data[i] + (a + prev_row[i]) // 2) & 0xFF
-        elif filter_byte == 4:  # Paeth
-            for i in range(stride):
-                a = row_data[i - channels] if i >= channels else 0
-                b = prev_row[i]
-                c = prev_row[i - channels] if i >= channels else 0
-                row_data[i] = (row_data[i] + paeth_predictor(a, b, c)) & 0xFF
-
-        if color_type == 2:  # RGB -> RGBA
-            rgba_row = bytearray()
-            for x in range(width):
-                rgba_row += row_data[x * 3:x * 3 + 3] + b"\xff"
-            pixels += rgba_row
-        else:
-            pixels += row_data
 
+        # Runs of consecutive Average or Paeth rows can be reconstructed
+        # together: both predictors only look left and up, so pixels on
+        # the same anti-diagonal of a strip are independent and numpy can
+        # sweep the otherwise serial recurrence diagonally. With numba
+        # available its native per-row loops win outright.
+        run = 1
+        if filter_byte in (3, 4) and np is not None and _paeth_row_numba is None:
+            while (y + run < height
+                   and raw[(y + run) * (stride + 1)] == filter_byte):
+                run += 1
+
+        if run >= 2:
+            decoded_rows = []
+            for strip_y in range(y, y + run, 8):
+                n = min(8, y + run - strip_y)
+                strip = _unfilter_rows_numpy(
+                    raw, strip_y * (stride + 1) + 1, n, prev_row, width,
+                    channels, filter_byte)
+                decoded_rows.extend(strip)
+                prev_row = strip[-1]
+            for i, row_data in enumerate(decoded_rows):
+                store_row(y + i, row_data)
+            y += run
+            continue
+
+        if use_views:
+            row_data = arr2d[y, 1:]
+            if filter_byte in (3, 4) and _paeth_row_numba is None:
+                # The serial Average/Paeth interpreter loops index per
+                # byte, and bytearray item access is several times faster
+                # than ndarray item access; bounce through a scratch row.
+                tmp = bytearray(row_data)
+                _UNFILTER[filter_byte](tmp, bytearray(prev_row), width, channels)
+                row_data[:] = np.frombuffer(tmp, np.uint8)
+            else:
+                _UNFILTER[filter_byte](row_data, prev_row, width, channels)
+            store_row(y, memoryview(row_data))
+        else:
+            row_data = bytearray(raw[row_start + 1:row_start + 1 + stride])
+            _UNFILTER[filter_byte](row_data, prev_row, width, channels)
+            store_row(y, row_data)
         prev_row = row_data
+        y += 1
 
-    return width, height, bytes(pixels)
+    return width, height, finish_pixels()
 
 
-def paeth_predictor(a, b, c):
-    p = a + b - c
-    pa = abs(p - a)
-    pb = abs(p - b)
-    pc = abs(p - c)
-    if pa <= pb and pa <= pc:
-        return a
-    elif pb <= pc:
-        return b
-    else:
-        return c
+# Per-filter row reconstruction, all mutating row_data in place. Indexed
+# by filter byte via _UNFILTER below, so the decoder's hot loop does one
+# table lookup per row instead of walking an if/elif chain, and each
+# handler can be swapped for a vectorized version independently.
+
+def _unfilter_none(row_data, prev_row, width, channels):
+    pass
 
 
-def write_png(path, width, height, raw_data):
-    """Write a minimal RGBA PNG file."""
-    def make_chunk(chunk_type, data):
-        chunk = chunk_type + data
-        crc = struct.pack(">I", zlib.crc32(chunk) & 0xFFFFFFFF)
-        return struct.pack(">I", len(data)) + chunk + crc
+def _unfilter_sub(row_data, prev_row, width, channels):
+    if np is not None:
+        # Sub only depends on the same channel of the previous pixel, so
+        # each channel column is an independent cumulative sum.
+        arr = np.frombuffer(row_data, np.uint8).reshape(width, channels)
+        np.add.accumulate(arr, axis=0, dtype=np.uint8, out=arr)
+        return
+    row_data[:] = swar_row_prefix_sum(row_data, channels)
 
-    ihdr_data = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
-    compressed = zlib.compress(raw_data)
 
-    with open(path, "wb") as f:
-        f.write(b"\x89PNG\r\n\x1a\n")
-        f.write(make_chunk(b"IHDR", ihdr_data))
-        f.write(make_chunk(b"IDAT", compressed))
-        f.write(make_chunk(b"IEND", b""))
+def _unfilter_up(row_data, prev_row, width, channels):
+    if np is not None:
+        arr = np.frombuffer(row_data, np.uint8)
+        arr += np.frombuffer(prev_row, np.uint8)
+        return
+    row_data[:] = swar_row_add(row_data, prev_row)
+
+
+def _unfilter_average(row_data, prev_row, width, channels):
+    if _avg_row_numba is not None:
+        _avg_row_numba(np.frombuffer(row_data, np.uint8),
+                       np.frombuffer(prev_row, np.uint8), channels)
+        return
+    for i in range(width * channels):
+        a = row_data[i - channels] if i >= channels else 0
+        row_data[i] = (row_data[i] + (a + prev_row[i]) // 2) & 0xFF
+
+
+_paeth_row_numba = _avg_row_numba = None
+if njit is not None:
+
+    @njit(cache=True)
+    def _avg_row_numba(row, prev, channels):
+        for i in range(row.shape[0]):
+            a = np.int16(row[i - channels]) if i >= channels else np.int16(0)
+            row[i] = np.uint8(np.int16(row[i]) + (a + np.int16(prev[i])) // 2)
+
+    @njit(cache=True)
+    def _paeth_row_numba(row, prev, channels):
+        for i in range(row.shape[0]):
+            if i >= channels:
+                a = np.int16(row[i - channels])
+                c = np.int16(prev[i - channels])
+            else:
+                a = np.int16(0)
+                c = np.int16(0)
+            b = np.int16(prev[i])
+            pa = b - c
+            if pa < 0:
+                pa = -pa
+            pb = a - c
+            if pb < 0:
+                pb = -pb
+            pc = a + b - c - c
+            if pc < 0:
+                pc = -pc
+            if pa <= pb and pa <= pc:
+                pred = a
+            elif pb <= pc:
+                pred = b
+            else:
+                pred = c
+            row[i] = np.uint8(np.int16(row[i]) + pred)
+
+
+def _unfilter_paeth(row_data, prev_row, width, channels):
+    if _paeth_row_numba is not None:
+        _paeth_row_numba(np.frombuffer(row_data, np.uint8),
+                         np.frombuffer(prev_row, np.uint8), channels)
+        return
+    # Predictor inlined: at one call per byte the CPython call frame
+    # costs more than the arithmetic, and the conditional expressions
+    # beat abs()'s global lookup. With p = a + b - c:
+    # |p-a| = |b-c|, |p-b| = |a-c|, |p-c| = |a+b-2c|.
+    for i in range(width * channels):
+        if i >= channels:
+            a = row_data[i - channels]
+            c = prev_row[i - channels]
+        else:
+            a = c = 0
+        b = prev_row[i]
+        pa = b - c
+        pa = pa if pa >= 0 else -pa
+        pb = a - c
+        pb = pb if pb >= 0 else -pb
+        pc = a + b - c - c
+        pc = pc if pc >= 0 else -pc
+        if pa <= pb and pa <= pc:
+            pred = a
+        elif pb <= pc:
+            pred = b
+        else:
+            pred = c
+        row_data[i] = (row_data[i] + pred) & 0xFF
+
+
+_UNFILTER = (_unfilter_none, _unfilter_sub, _unfilter_up,
+             _unfilter_average, _unfilter_paeth)
+
+
+def swar_row_add(row_bytes, other_bytes):
+    """Byte-wise modular add of two equal-length rows packed into big ints.
+
+    Classic SWAR: add all bytes in one integer addition while masking the
+    high bit of every byte so carries never cross byte boundaries. The
+    arithmetic runs in C inside the int ops, replacing one interpreted
+    iteration per byte. Pure stdlib, used when numpy is unavailable.
+    """
+    n = len(row_bytes)
+    high = int.from_bytes(b"\x80" * n, "little")
+    x = int.from_bytes(row_bytes, "little")
+    y = int.from_bytes(other_bytes, "little")
+    s = ((x & ~high) + (y & ~high)) ^ ((x ^ y) & high)
+    return s.to_bytes(n, "little")
+
+
+def swar_row_prefix_sum(row_bytes, pixel_size):
+    """Per-byte-lane running sum across pixels via big-int doubling.
+
+    Sub reconstruction is a per-channel prefix sum mod 256. With the row
+    packed into one big int, each doubling step adds the row to itself
+    shifted by 2**k pixels using the same carry-suppressed SWAR add as
+    swar_row_add, so the whole row reconstructs in O(log width) big-int
+    operations instead of one interpreted iteration per byte.
+    """
+    n = len(row_bytes)
+    full = (1 << (n * 8)) - 1
+    high = int.from_bytes(b"\x80" * n, "little")
+    low = high ^ full
+    r = int.from_bytes(row_bytes, "little")
+    shift = pixel_size * 8
+    while shift < n * 8:
+        s = (r << shift) & full
+        r = ((r & low) + (s & low)) ^ ((r ^ s) & high)
+        shift <<= 1
+    return r.to_bytes(n, "little")
+
+
+def _unfilter_rows_numpy(raw, data_start, nrows, prev_row, width, channels,
+                         ftype):
+    """Reconstruct up to 8 consecutive Average/Paeth rows with numpy.
+
+    Both predictors at (row, x) only depend on (row, x-1), (row-1, x)
+    and (row-1, x-1), so every pixel on the same anti-diagonal of the strip
+    is independent and a whole diagonal can be computed in one vector step.
+    Returns the reconstructed rows as a list of bytearrays.
+    """
+    stride = width * channels
+    # One extra row on top for the previous scanline, one extra pixel on the
+    # left so the a/c terms at x == 0 read zeros instead of branching.
+    ext = np.zeros((nrows + 1, stride + channels), dtype=np.uint8)
+    ext[0, channels:] = np.frombuffer(prev_row, np.uint8)
+    for r in range(nrows):
+        start = data_start + r * (stride + 1)
+        ext[r + 1, channels:] = np.frombuffer(raw, np.uint8, stride, start)
+
+    ks = np.arange(channels)
+    for d in range(nrows + width - 1):
+        rs = np.arange(max(0, d - width + 1), min(nrows - 1, d) + 1)
+        cols = (d - rs + 1)[:, None] * channels + ks
+        rows = rs[:, None]
+        a = ext[rows + 1, cols - channels].astype(np.int16)
+        b = ext[rows, cols].astype(np.int16)
+        if ftype == 3:
+            pred = ((a + b) >> 1).astype(np.uint8)
+        else:
+            c = ext[rows, cols - channels].astype(np.int16)
+            pa = np.abs(b - c)
+            pb = np.abs(a - c)
+            pc = np.abs(a + b - 2 * c)
+            pred = np.where((pa <= pb) & (pa <= pc), a,
+                            np.where(pb <= pc, b, c)).astype(np.uint8)
+        ext[rows + 1, cols] += pred
+
+    return [bytearray(ext[r + 1, channels:].tobytes()) for r in range(nrows)]
+
+
+# CRC seeds for the chunk types write_png emits, plus the IEND chunk,
+# which is fully constant, computed once at import.
+_CRC_IHDR = zlib.crc32(b"IHDR")
+_CRC_IDAT = zlib.crc32(b"IDAT")
+_IEND_CHUNK = _U32.pack(0) + b"IEND" + _U32.pack(zlib.crc32(b"IEND") & 0xFFFFFFFF)
+
+
+def write_png(path, width, height, raw_data, level=6):
+    """Write a minimal RGBA PNG file.
+
+    level is the zlib compression level; spritesheets are ephemeral
+    artifacts, so their callers trade ratio for encode speed.
+    """
+    out = bytearray(b"\x89PNG\r\n\x1a\n")
+
+    def append_chunk(chunk_type, data, type_crc):
+        # CRC is seeded with the type's precomputed CRC so the
+        # type + data buffer is never materialized just to checksum it.
+        out.extend(_U32.pack(len(data)))
+        out.extend(chunk_type)
+        out.extend(data)
+        out.extend(_U32.pack(zlib.crc32(data, type_crc) & 0xFFFFFFFF))
+
+    append_chunk(b"IHDR", _IHDR.pack(width, height, 8, 6, 0, 0, 0), _CRC_IHDR)
+    append_chunk(b"IDAT", zlib.compress(raw_data, level), _CRC_IDAT)
+    out.extend(_IEND_CHUNK)
+    write_file_bytes(path, out)
 
 
 def add_size_args(parser, default_w=64, default_h=64):
@@ -306,6 +836,16 @@ def add_pick_arg(parser):
                         help="Save all variations instead of just the first")
 
 
+def add_spritesheet_args(parser):
+    parser.add_argument("--spritesheet", action="store_true",
+                        help="Also create a horizontal spritesheet")
+    parser.add_argument("--spritesheet-store", action="store_true",
+                        help="Spritesheet with uncompressed PNG data (fastest encode)")
+    parser.add_argument("--compression-level", type=int, default=1,
+                        choices=range(10), metavar="{0-9}",
+                        help="zlib level for the spritesheet PNG (default: 1)")
+
+
 # --- Subcommand handlers ---
 
 def cmd_balance(args):
@@ -344,7 +884,7 @@ def cmd_generate(args):
     if args.seed is not None:
         body["seed"] = args.seed
     if args.reference_images:
-        body["reference_images"] = [make_base64_image(p) for p in args.reference_images]
+        body["reference_images"] = make_base64_images(args.reference_images)
     if args.style_image:
         body["style_image"] = make_base64_image(args.style_image)
 
@@ -367,7 +907,7 @@ def cmd_generate_with_style(args):
 
     body = {
         "description": args.description,
-        "style_images": [make_style_image(p) for p in args.style_images],
+        "style_images": make_base64_images(args.style_images, make_style_image),
         "image_size": {"width": args.width, "height": args.height},
     }
 
@@ -413,15 +953,9 @@ def cmd_animate(args):
 
     images = resp.get("images", [])
     base = args.output or "frame"
-    output_files = save_image_array(images, base)
+    output_files = save_animation_frames(images, base, args)
     cost = resp.get("usage", {}).get("usd", 0)
 
-    if args.spritesheet and len(output_files) > 1:
-        sheet_base = base if not base.endswith(".png") else base[:-4]
-        sheet_path = f"{sheet_base}_spritesheet.png"
-        make_spritesheet(output_files, sheet_path)
-        output_files.append(sheet_path)
-
     output_success(output_files, cost, {"frame_count": len(images)})
 
 
@@ -505,7 +1039,7 @@ def cmd_edit(args):
 
     body = {
         "method": args.method,
-        "edit_images": [make_base64_image(p) for p in args.edit_images],
+        "edit_images": make_base64_images(args.edit_images),
         "image_size": {"width": args.width, "height": args.height},
     }
 
@@ -550,15 +1084,9 @@ def cmd_interpolate(args):
 
     images = resp.get("images", [])
     base = args.output or "interp"
-    output_files = save_image_array(images, base)
+    output_files = save_animation_frames(images, base, args)
     cost = resp.get("usage", {}).get("usd", 0)
 
-    if args.spritesheet and len(output_files) > 1:
-        sheet_base = base if not base.endswith(".png") else base[:-4]
-        sheet_path = f"{sheet_base}_spritesheet.png"
-        make_spritesheet(output_files, sheet_path)
-        output_files.append(sheet_path)
-
     output_success(output_files, cost, {"frame_count": len(images)})
 
 
@@ -569,7 +1097,7 @@ def cmd_edit_animation(args):
 
     body = {
         "description": args.description,
-        "frames": [make_base64_image(p) for p in args.frames],
+        "frames": make_base64_images(args.frames),
         "image_size": {"width": args.width, "height": args.height},
     }
 
@@ -584,15 +1112,9 @@ def cmd_edit_animation(args):
 
     images = resp.get("images", [])
     base = args.output or "edited_frame"
-    output_files = save_image_array(images, base)
+    output_files = save_animation_frames(images, base, args)
     cost = resp.get("usage", {}).get("usd", 0)
 
-    if args.spritesheet and len(output_files) > 1:
-        sheet_base = base if not base.endswith(".png") else base[:-4]
-        sheet_path = f"{sheet_base}_spritesheet.png"
-        make_spritesheet(output_files, sheet_path)
-        output_files.append(sheet_path)
-
     output_success(output_files, cost)
 
 
@@ -603,7 +1125,7 @@ def cmd_transfer_outfit(args):
 
     body = {
         "reference_image": make_base64_image(args.reference_image),
-        "frames": [make_base64_image(p) for p in args.frames],
+        "frames": make_base64_images(args.frames),
         "image_size": {"width": args.width, "height": args.height},
     }
 
@@ -618,15 +1140,9 @@ def cmd_transfer_outfit(args):
 
     images = resp.get("images", [])
     base = args.output or "outfit_frame"
-    output_files = save_image_array(images, base)
+    output_files = save_animation_frames(images, base, args)
     cost = resp.get("usage", {}).get("usd", 0)
 
-    if args.spritesheet and len(output_files) > 1:
-        sheet_base = base if not base.endswith(".png") else base[:-4]
-        sheet_path = f"{sheet_base}_spritesheet.png"
-        make_spritesheet(output_files, sheet_path)
-        output_files.append(sheet_path)
-
     output_success(output_files, cost)
 
 
@@ -648,8 +1164,7 @@ def cmd_estimate_skeleton(args):
 
     output_files = []
     if args.output:
-        with open(args.output, "w") as f:
-            json.dump(keypoints, f, indent=2)
+        write_file_bytes(args.output, json.dumps(keypoints, indent=2).encode("utf-8"))
         output_files.append(args.output)
 
     print(json.dumps({
@@ -661,18 +1176,16 @@ def cmd_estimate_skeleton(args):
 
 
 # --- Argument parser ---
+#
+# Each subcommand registers its arguments in its own function so that a
+# normal invocation only constructs the one subparser it needs; building
+# all of them dominates CLI cold start.
 
-def build_parser():
-    parser = argparse.ArgumentParser(
-        description="PixelLab API v2 - pixel art generation CLI",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-    )
-    sub = parser.add_subparsers(dest="command", required=True)
-
-    # balance
+def _add_balance_parser(sub):
     sub.add_parser("balance", help="Check account balance and subscription")
 
-    # generate
+
+def _add_generate_parser(sub):
     p = sub.add_parser("generate", help="Generate pixel art from text (Pro)")
     p.add_argument("--description", required=True, help="Text description of image")
     add_size_args(p, 64, 64)
@@ -684,7 +1197,8 @@ def build_parser():
     add_pick_arg(p)
     p.add_argument("--output", "-o", default=None, help="Output path (default: output)")
 
-    # generate-with-style
+
+def _add_generate_with_style_parser(sub):
     p = sub.add_parser("generate-with-style", help="Style-guided generation (Pro)")
     p.add_argument("--description", required=True, help="Text description of image")
     p.add_argument("--style-images", nargs="+", required=True,
@@ -696,7 +1210,8 @@ def build_parser():
     add_pick_arg(p)
     p.add_argument("--output", "-o", default=None, help="Output path (default: output)")
 
-    # animate
+
+def _add_animate_parser(sub):
     p = sub.add_parser("animate", help="Text-guided animation (Pro)")
     p.add_argument("--reference-image", required=True, help="Path to reference character image")
     p.add_argument("--ref-width", type=int, required=True,
@@ -708,12 +1223,12 @@ def build_parser():
     p.add_argument("--no-background", action="store_true", default=None,
                    help="Transparent background (default: true)")
     add_seed_arg(p)
-    p.add_argument("--spritesheet", action="store_true",
-                   help="Also create a horizontal spritesheet")
+    add_spritesheet_args(p)
     p.add_argument("--output", "-o", default=None,
                    help="Output base name (default: frame)")
 
-    # rotate-8
+
+def _add_rotate_8_parser(sub):
     p = sub.add_parser("rotate-8", help="Generate 8 directional rotations (Pro)")
     p.add_argument("--method", required=True,
                    choices=["rotate_character", "create_with_style", "create_from_concept"],
@@ -730,7 +1245,8 @@ def build_parser():
     p.add_argument("--output", "-o", default=None,
                    help="Output base name (default: rotation)")
 
-    # inpaint
+
+def _add_inpaint_parser(sub):
     p = sub.add_parser("inpaint", help="Edit masked region of pixel art (Pro)")
     p.add_argument("--description", required=True,
                    help="Description of what to generate in mask")
@@ -743,7 +1259,8 @@ def build_parser():
     add_pick_arg(p)
     p.add_argument("--output", "-o", default=None, help="Output path (default: inpainted)")
 
-    # edit
+
+def _add_edit_parser(sub):
     p = sub.add_parser("edit", help="Edit images with text or reference (Pro)")
     p.add_argument("--method", required=True,
                    choices=["edit_with_text", "edit_with_reference"],
@@ -758,7 +1275,8 @@ def build_parser():
     p.add_argument("--no-background", action="store_true", help="Transparent background")
     p.add_argument("--output", "-o", default=None, help="Output base name (default: edited)")
 
-    # interpolate
+
+def _add_interpolate_parser(sub):
     p = sub.add_parser("interpolate",
                        help="Generate frames between two keyframes (Pro)")
     p.add_argument("--start-image", required=True, help="Path to starting keyframe")
@@ -767,12 +1285,12 @@ def build_parser():
     add_size_args(p, 64, 64)
     p.add_argument("--no-background", action="store_true", help="Transparent background")
     add_seed_arg(p)
-    p.add_argument("--spritesheet", action="store_true",
-                   help="Also create a horizontal spritesheet")
+    add_spritesheet_args(p)
     p.add_argument("--output", "-o", default=None,
                    help="Output base name (default: interp)")
 
-    # edit-animation
+
+def _add_edit_animation_parser(sub):
     p = sub.add_parser("edit-animation", help="Edit existing animation frames (Pro)")
     p.add_argument("--description", required=True, help="Edit description")
     p.add_argument("--frames", nargs="+", required=True,
@@ -780,12 +1298,12 @@ def build_parser():
     add_size_args(p, 64, 64)
     p.add_argument("--no-background", action="store_true", help="Transparent background")
     add_seed_arg(p)
-    p.add_argument("--spritesheet", action="store_true",
-                   help="Also create a horizontal spritesheet")
+    add_spritesheet_args(p)
     p.add_argument("--output", "-o", default=None,
                    help="Output base name (default: edited_frame)")
 
-    # transfer-outfit
+
+def _add_transfer_outfit_parser(sub):
     p = sub.add_parser("transfer-outfit",
                        help="Transfer outfit across animation frames (Pro)")
     p.add_argument("--reference-image", required=True,
@@ -795,12 +1313,12 @@ def build_parser():
     add_size_args(p, 64, 64)
     p.add_argument("--no-background", action="store_true", help="Transparent background")
     add_seed_arg(p)
-    p.add_argument("--spritesheet", action="store_true",
-                   help="Also create a horizontal spritesheet")
+    add_spritesheet_args(p)
     p.add_argument("--output", "-o", default=None,
                    help="Output base name (default: outfit_frame)")
 
-    # estimate-skeleton
+
+def _add_estimate_skeleton_parser(sub):
     p = sub.add_parser("estimate-skeleton",
                        help="Extract skeleton keypoints from character")
     p.add_argument("--image", required=True,
@@ -808,31 +1326,51 @@ def build_parser():
     p.add_argument("--output", "-o", default=None,
                    help="Output JSON file for keypoints")
 
+
+# Single dispatch table: subcommand -> (parser registration, handler).
+# Built once at module load so main never constructs per-run dicts or
+# leans on argparse to discover the command.
+COMMANDS = {
+    "balance": (_add_balance_parser, cmd_balance),
+    "generate": (_add_generate_parser, cmd_generate),
+    "generate-with-style": (_add_generate_with_style_parser, cmd_generate_with_style),
+    "animate": (_add_animate_parser, cmd_animate),
+    "rotate-8": (_add_rotate_8_parser, cmd_rotate_8),
+    "inpaint": (_add_inpaint_parser, cmd_inpaint),
+    "edit": (_add_edit_parser, cmd_edit),
+    "interpolate": (_add_interpolate_parser, cmd_interpolate),
+    "edit-animation": (_add_edit_animation_parser, cmd_edit_animation),
+    "transfer-outfit": (_add_transfer_outfit_parser, cmd_transfer_outfit),
+    "estimate-skeleton": (_add_estimate_skeleton_parser, cmd_estimate_skeleton),
+}
+
+
+def build_parser(only=None):
+    """Build the argument parser.
+
+    When only names a known subcommand, just that subparser is registered;
+    help and error paths pass None to get the full parser.
+    """
+    parser = argparse.ArgumentParser(
+        description="PixelLab API v2 - pixel art generation CLI",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (register, _handler) in COMMANDS.items():
+        if only is None or name == only:
+            register(sub)
     return parser
 
 
 def main():
-    parser = build_parser()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else None
+    parser = build_parser(only=cmd if cmd in COMMANDS else None)
     args = parser.parse_args()
 
-    handlers = {
-        "balance": cmd_balance,
-        "generate": cmd_generate,
-        "generate-with-style": cmd_generate_with_style,
-        "animate": cmd_animate,
-        "rotate-8": cmd_rotate_8,
-        "inpaint": cmd_inpaint,
-        "edit": cmd_edit,
-        "interpolate": cmd_interpolate,
-        "edit-animation": cmd_edit_animation,
-        "transfer-outfit": cmd_transfer_outfit,
-        "estimate-skeleton": cmd_estimate_skeleton,
-    }
-
-    handler = handlers.get(args.command)
-    if handler:
+    entry = COMMANDS.get(args.command)
+    if entry:
         try:
-            handler(args)
+            entry[1](args)
         except FileNotFoundError as e:
             output_error(f"File not found: {e.filename}")
         except json.JSONDecodeError as e: